@@ -1,16 +1,20 @@
 '''Build FiraMath.glyphspackage.
 '''
 
+import concurrent.futures
+import contextlib
 import copy
 import functools
+import io
 import multiprocessing
 import os
+import re
 import sys
 import time
 
 import fontmake
 from fontmake.font_project import FontProject, GLYPHS_PREFIX, GLYPH_EXPORT_KEY, PUBLIC_PREFIX
-from fontmake.instantiator import Instantiator
+from fontmake.instantiator import Instantiator, process_rules_swaps
 
 import fontTools
 from fontTools.designspaceLib import DesignSpaceDocument, InstanceDescriptor
@@ -19,6 +23,11 @@ from fontTools.ttLib.ttFont import newTable
 
 import glyphsLib
 from glyphsLib import GSComponent, GSFont, GSGlyph, GSLayer, GSNode, GSPath, glyphdata
+from glyphsLib.builder.builders import UFOBuilder
+
+import numpy as np
+
+import openstep_plist
 
 import toml
 
@@ -28,11 +37,12 @@ from math_table import MathTable, MathTableInstantiator
 class Font:
 
     def __init__(self, path: str):
-        self.font: GSFont = glyphsLib.load(path)
+        self.font: GSFont = self._load_pkg(path) if os.path.isdir(path) else glyphsLib.load(path)
         self.math_tables = {}
         masters = sorted(self.font.masters, key=lambda m: m.weightValue)
         self._masters_num = len(masters)
         self._master_id_indices = {m.id: i for i, m in enumerate(masters)}
+        self._master_layers_cache: dict[int, list[GSLayer]] = {}
         self.interpolations: dict[str, tuple] = {
             i.name: [
                 (self._master_id_indices[id], value)
@@ -40,11 +50,57 @@ class Font:
             ]
             for i in self.font.instances if i.active
         }
-        self.production_names: dict[str, str] = {
+        # Plain dict lookups are much cheaper than `GSFont.glyphs[name]`.
+        self._glyphs_by_name: dict[str, GSGlyph] = {g.name: g for g in self.font.glyphs}
+        self._export_glyphs: list[GSGlyph] = [g for g in self.font.glyphs if g.export]
+        self._decompose_smart_comp()
+
+    @functools.cached_property
+    def production_names(self) -> dict[str, str]:
+        # Deferred until glyph names are actually normalized: the glyphdata lookups
+        # need to load the whole GlyphData XML, which font loading itself never uses.
+        return {
             g.name: glyphdata.get_glyph(g.name).production_name
             for g in self.font.glyphs
         }
-        self._decompose_smart_comp()
+
+    @staticmethod
+    def _load_pkg(path: str) -> GSFont:
+        '''Load a `.glyphspackage` bundle.
+        The glyph files are read in a thread pool: the work is I/O-bound, so threads are
+        enough to overlap the hundreds of small reads.
+        '''
+        # Binary reads skip text-mode newline translation; the sources are UTF-8.
+        with open(os.path.join(path, 'fontinfo.plist'), 'rb') as fontinfo_plist:
+            fontinfo = fontinfo_plist.read().decode('utf-8')
+        with open(os.path.join(path, 'order.plist'), 'rb') as order_plist:
+            # `openstep_plist` is C-accelerated; `glyphsLib.parser.Parser` would only
+            # wrap it with an extra Python-level walk we don't need for a name list.
+            order = openstep_plist.loads(order_plist.read().decode('utf-8'))
+        glyph_files = {e.name: e.path for e in os.scandir(os.path.join(path, 'glyphs'))}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count() * 2) as executor:
+            glyphs = ',\n'.join(executor.map(
+                Font._read_glyph,
+                (glyph_files[Font._glyph_file_name(name)] for name in order),
+            ))
+        insert_pos = fontinfo.rfind('}')
+        return glyphsLib.loads(
+            fontinfo[:insert_pos] + 'glyphs = (\n' + glyphs + '\n);\n' + fontinfo[insert_pos:]
+        )
+
+    @staticmethod
+    def _glyph_file_name(name: str) -> str:
+        # Uppercase letters are escaped with `_` in glyph file names (e.g. `A_.glyph`),
+        # while a leading `.` is replaced by `_` (e.g. `_notdef.glyph`).
+        file_name = re.sub(r'([A-Z])', r'\1_', name) + '.glyph'
+        if file_name.startswith('.'):
+            file_name = '_' + file_name[1:]
+        return file_name
+
+    @staticmethod
+    def _read_glyph(file_path: str) -> str:
+        with open(file_path, 'rb') as glyph_file:
+            return glyph_file.read().decode('utf-8').rstrip('\n')
 
     def _decompose_smart_comp(self):
         '''Decompose smart components.
@@ -61,7 +117,7 @@ class Font:
                         paths = self._component_to_paths(comp)
                     layer.paths.extend(paths)
                     to_be_removed.append(comp)
-                layer._shapes = [s for s in layer._shapes if s not in to_be_removed]
+                self._remove_shapes(layer, to_be_removed)
         for glyph in filter(lambda g: not self._is_smart_glyph(g), self.font.glyphs):
             for layer in glyph.layers:
                 to_be_removed = []
@@ -70,7 +126,13 @@ class Font:
                         paths = self._smart_component_to_paths(comp)
                         layer.paths.extend(paths)
                         to_be_removed.append(comp)
-                layer._shapes = [s for s in layer._shapes if s not in to_be_removed]
+                self._remove_shapes(layer, to_be_removed)
+
+    @staticmethod
+    def _remove_shapes(layer: GSLayer, shapes: list):
+        # Filter by identity: `shape in shapes` would compare shapes element-wise.
+        removed_ids = {id(s) for s in shapes}
+        layer._shapes = [s for s in layer._shapes if id(s) not in removed_ids]
 
     @staticmethod
     def _is_smart_glyph(glyph: GSGlyph) -> bool:
@@ -90,23 +152,27 @@ class Font:
         ref_glyph: GSGlyph = comp.component
         if len(values) == 0:
             interpolation_value = 0
-            def _is_part_n(layer, n):
-                return (
-                    layer.associatedMasterId == master_id and
-                    layer.partSelection[next(iter(layer.partSelection.keys()))] == n
-                )
+            key = None
         elif len(values) == 1:
             key, value = next(iter(values.items()))
             interpolation_value = next(
                 Font._rescale(value, axis.bottomValue, axis.topValue)
                 for axis in ref_glyph.smartComponentAxes if axis.name == key
             )
-            def _is_part_n(layer, n):
-                return layer.associatedMasterId == master_id and layer.partSelection[key] == n
         else:
             raise ValueError('We only support single smart component axis!')
-        layer_0: GSLayer = next(layer for layer in ref_glyph.layers if _is_part_n(layer, 1))
-        layer_1: GSLayer = next(layer for layer in ref_glyph.layers if _is_part_n(layer, 2))
+        # Find both part layers in a single pass over the layer list.
+        parts: dict[int, GSLayer] = {}
+        for layer in ref_glyph.layers:
+            if layer.associatedMasterId != master_id or not (selection := layer.partSelection):
+                continue
+            n = selection[key] if key else selection[next(iter(selection))]
+            if n in (1, 2) and n not in parts:
+                parts[n] = layer
+                if len(parts) == 2:
+                    break
+        layer_0: GSLayer = parts[1]
+        layer_1: GSLayer = parts[2]
         paths = []
         for path_0, path_1 in zip(layer_0.paths, layer_1.paths):
             path = Font._interpolate_path(path_0, path_1, interpolation_value)
@@ -139,21 +205,28 @@ class Font:
     def _component_to_paths(comp: GSComponent) -> list[GSPath]:
         '''Return the paths of a normal component `comp`, i.e. decompose `comp`.'''
         ref_glyph: GSGlyph = comp.component
-        paths = next(
-            layer.paths for layer in ref_glyph.layers
-            if layer.layerId == comp.parent.associatedMasterId
-        )
+        paths = _layers_by_id(ref_glyph)[comp.parent.associatedMasterId].paths
+        xx, xy, yx, yy, dx, dy = comp.transform
+        matrix = np.array([[xx, xy], [yx, yy]])
+        offset = np.array([dx, dy])
         result = []
         for path in paths:
-            # Manually deepcopy (`copy.deepcopy()` is very slow here).
+            # Manually deepcopy (`copy.deepcopy()` is very slow here), transforming all
+            # node positions in one go instead of per node via `applyTransform`.
+            positions = np.array(
+                [(n.position.x, n.position.y) for n in path.nodes]
+            ).reshape(-1, 2) @ matrix + offset
             new_path = copy.copy(path)
-            new_path.nodes = [GSNode(n.position, type=n.type, smooth=n.smooth) for n in path.nodes]
-            new_path.applyTransform(comp.transform)
+            new_path.nodes = [
+                GSNode(position, type=n.type, smooth=n.smooth)
+                for position, n in zip(positions.tolist(), path.nodes)
+            ]
             result.append(new_path)
         return result
 
     def to_ufos(self, interpolate: bool = True, default_index: int = None) -> list:
-        master_ufos, instance_data = glyphsLib.to_ufos(self.font, include_instances=True)
+        with _skip_unused_ufo_conversions():
+            master_ufos, instance_data = glyphsLib.to_ufos(self.font, include_instances=True)
         if not interpolate:
             return master_ufos
         designspace = self._to_designspace(instance_data)
@@ -173,7 +246,16 @@ class Font:
                 i.axes[axis_index] for i in self.font.instances if isinstance(i.weight, str)
             )
         instantiator = Instantiator.from_designspace(designspace)
-        return [self._generate_instance(instantiator, i) for i in designspace.instances]
+        # Instances sitting exactly on a master need no interpolation; brace-layer
+        # sources are sparse and cannot stand in for a full master.
+        master_ufos = {
+            tuple(sorted(source.location.items())): source.font
+            for source in designspace.sources if source.layerName is None
+        }
+        return [
+            self._generate_instance(instantiator, i, master_ufos)
+            for i in designspace.instances
+        ]
 
     @staticmethod
     def _to_designspace(instance_data: dict) -> DesignSpaceDocument:
@@ -187,8 +269,26 @@ class Font:
         return designspace
 
     @staticmethod
-    def _generate_instance(instantiator: Instantiator, instance: InstanceDescriptor):
-        ufo = instantiator.generate_instance(instance)
+    def _generate_instance(
+        instantiator: Instantiator, instance: InstanceDescriptor, master_ufos: dict = {}
+    ):
+        master = master_ufos.get(tuple(sorted(instance.location.items())))
+        location = {**instantiator.default_design_location, **instance.location}
+        if master is not None and not process_rules_swaps(
+            instantiator.designspace_rules, location, instantiator.glyph_names
+        ):
+            # Short-circuit: reuse the master UFO and only apply the instance naming.
+            # Note that the master may be named differently (e.g. instance `Two` sits
+            # on master `Light`), and that an instance with active bracket-rule swaps
+            # must still be interpolated.
+            ufo = copy.copy(master)
+            ufo.info.familyName = instance.familyName
+            ufo.info.styleName = instance.styleName
+            ufo.info.postscriptFontName = instance.postScriptFontName
+            ufo.info.styleMapFamilyName = instance.styleMapFamilyName
+            ufo.info.styleMapStyleName = instance.styleMapStyleName
+        else:
+            ufo = instantiator.generate_instance(instance)
         ufo.info.openTypeOS2WeightClass = instance.lib[GLYPHS_PREFIX + 'weightValue']
         if custom_parameters := instance.lib.get(GLYPHS_PREFIX + 'customParameters'):
             if remove_glyphs := dict(custom_parameters).get('Remove Glyphs'):
@@ -197,30 +297,42 @@ class Font:
             glyph.lib[GLYPH_EXPORT_KEY] = False
         return ufo
 
-    def add_math_table(self, toml_path: str, input_dir: str, output_dir: str = None):
+    def add_math_table(
+        self, toml_path: str, input_dir: str, output_dir: str = None, parallel: bool = True
+    ):
         if not output_dir:
             output_dir = input_dir
         if not os.path.isdir(output_dir):
             os.mkdir(output_dir)
-        self.math_tables = self._parse_math_table(toml_path)
+        self.math_tables = self._parse_math_table(toml_path, parallel=parallel)
+        args = []
         for style in self.interpolations:
             font_file_name = self._font_file_name(style)
             eprint(f'=> {font_file_name}')
-            input_path = os.path.join(input_dir, font_file_name)
-            output_path = os.path.join(output_dir, font_file_name)
-            self._write_math_table(style, input_path, output_path)
-            self._normalize_glyph_names(output_path, output_path)
+            args.append((
+                os.path.join(input_dir, font_file_name),
+                os.path.join(output_dir, font_file_name),
+                self.math_tables[style],
+                self.production_names,
+            ))
+        if parallel:
+            with multiprocessing.Pool() as p:
+                p.map(_write_font, args)
+        else:
+            for arg in args:
+                _write_font(arg)
 
-    def _parse_math_table(self, toml_path: str) -> dict[str, MathTable]:
+    def _parse_math_table(self, toml_path: str, parallel: bool = True) -> dict[str, MathTable]:
         master_data = self._parse_master_data(toml_path)
-        return {
-            style: MathTableInstantiator(
-                master_data,
-                interpolation,
-                self._removed_glyphs(style),
-            ).generate()
+        args = [
+            (style, master_data, interpolation, self._removed_glyphs(style))
             for style, interpolation in self.interpolations.items()
-        }
+        ]
+        # The styles are independent, so they can be instantiated in parallel.
+        if parallel:
+            with multiprocessing.Pool() as p:
+                return dict(p.imap_unordered(_instantiate_math_table, args))
+        return dict(map(_instantiate_math_table, args))
 
     def _removed_glyphs(self, style: str) -> list[str]:
         instance = next(i for i in self.font.instances if i.name == style)
@@ -259,7 +371,9 @@ class Font:
 
     @staticmethod
     def _toml_parse(toml_path: str) -> dict[str]:
-        data = toml.load(toml_path)
+        # `toml` decodes inline tables into local dict subclasses, which cannot be
+        # pickled for the worker pool. Normalize everything into plain dicts/lists.
+        data = Font._to_plain(toml.load(toml_path))
         data['MathGlyphInfo']['ExtendedShapes'] = \
             Font._glyph_names_expand(data['MathGlyphInfo']['ExtendedShapes'])
         for key in ('HorizontalVariants', 'VerticalVariants'):
@@ -267,6 +381,14 @@ class Font:
                 data['MathVariants'][key][glyph] = Font._string_expand(variants)
         return data
 
+    @staticmethod
+    def _to_plain(data):
+        if isinstance(data, dict):
+            return {key: Font._to_plain(value) for key, value in data.items()}
+        if isinstance(data, list):
+            return [Font._to_plain(value) for value in data]
+        return data
+
     @staticmethod
     def _glyph_names_expand(names: list[str]) -> list[str]:
         res = []
@@ -294,14 +416,14 @@ class Font:
         # Uncapitalize: 'TopAccent' -> 'topAccent', etc.
         name = name[0].lower() + name[1:]
         mappings = {}
-        for glyph in (g for g in self.font.glyphs if g.export):
+        for glyph in self._export_glyphs:
             if values := self._get_user_data(glyph, name):
                 mappings[glyph.name] = values
         return mappings
 
     def _get_user_data(self, glyph: GSGlyph, name: str) -> list:
         values = []
-        for layer in self._master_layers(glyph.layers):
+        for layer in self._master_layers(glyph):
             # Assume there is only one `name` in layer.userData
             try:
                 data = next(d for d in layer.userData if name in d)
@@ -310,15 +432,21 @@ class Font:
                 pass
         return values
 
-    def _master_layers(self, layers) -> list[GSLayer]:
-        return sorted(
-            (l for l in layers if l.associatedMasterId == l.layerId),
-            key=lambda l: self._master_id_indices[l.associatedMasterId]
-        )
+    def _master_layers(self, glyph: GSGlyph) -> list[GSLayer]:
+        '''Return the master layers of `glyph`, sorted by weight. The result is memoized
+        since this is called for every math field of every glyph.
+        '''
+        key = id(glyph)
+        if (layers := self._master_layers_cache.get(key)) is None:
+            layers = self._master_layers_cache[key] = sorted(
+                (l for l in glyph.layers if l.associatedMasterId == l.layerId),
+                key=lambda l: self._master_id_indices[l.associatedMasterId]
+            )
+        return layers
 
     def _advances(self, glyph: str, direction: str, plus_1: bool = False) -> list:
         result = []
-        for layer in self._master_layers(self.font.glyphs[glyph].layers):
+        for layer in self._master_layers(self._glyphs_by_name[glyph]):
             size = layer.bounds.size
             advance = size.width if direction == 'H' else size.height
             result.append(abs(round(advance)))
@@ -328,7 +456,7 @@ class Font:
 
     def _variant_part(self, glyph: str, direction: str) -> dict[str, list]:
         result = {
-            name: self._get_user_data(self.font.glyphs[glyph], name)
+            name: self._get_user_data(self._glyphs_by_name[glyph], name)
             for name in ['startConnector', 'endConnector']
         }
         result['fullAdvance'] = self._advances(glyph, direction)
@@ -338,27 +466,26 @@ class Font:
         font_name = self.font.familyName.replace(' ', '')
         return f'{font_name}-{style}.otf'
 
-    def _write_math_table(self, style: str, input_path: str, output_path: str):
-        with TTFont(input_path) as tt_font:
-            tt_font['MATH'] = newTable('MATH')
-            tt_font['MATH'].table = self.math_tables[style].encode()
-            tt_font.save(output_path)
-
-    def _normalize_glyph_names(self, input_path: str, output_path: str):
-        '''Normalize glyph names using AGL convention.'''
-        with TTFont(input_path) as tt_font:
-            cff = tt_font['CFF '].cff
-            cff.strings.strings = list(map(self._normalize_string, cff.strings.strings))
-            tt_font.save(output_path)
-
-    def _normalize_string(self, s: str) -> str:
-        # Ad-hoc treatment for copyright string
-        if 'Copyright Copyright' in s:
-            s = s.replace('Copyright Copyright', 'Copyright')  # For U+00A9 `©`
-            s = s.replace('?', '-')  # For U+2013 `–`
-            return s
-        # For glyph names
-        return self.production_names.get(s, s)
+
+@contextlib.contextmanager
+def _skip_unused_ufo_conversions():
+    '''Temporarily no-op the glyphsLib conversions for background layers/images, guidelines
+    and annotations, which FiraMath never uses but which are run for every glyph.
+    '''
+    names = (
+        'to_ufo_background_image',
+        'to_ufo_guidelines',
+        'to_ufo_glyph_background',
+        'to_ufo_annotations',
+    )
+    saved = {name: getattr(UFOBuilder, name) for name in names}
+    try:
+        for name in names:
+            setattr(UFOBuilder, name, lambda self, *args, **kwargs: None)
+        yield
+    finally:
+        for name, method in saved.items():
+            setattr(UFOBuilder, name, method)
 
 
 class Timer:
@@ -407,12 +534,77 @@ def build(input_path: str, toml_path: str, output_dir: str, parallel: bool = Tru
     with Timer('Generating OTF...'):
         _build = functools.partial(_build_otf, output_dir=output_dir)
         if parallel:
-            with multiprocessing.Pool() as p:
-                p.map(_build, ufos)
+            # `forkserver` workers start from a minimal server process instead of
+            # inheriting the whole loaded font state; `maxtasksperchild` keeps the
+            # per-worker memory bounded when recompiling many instances.
+            ctx = multiprocessing.get_context('forkserver')
+            with ctx.Pool(maxtasksperchild=8, initializer=_init_otf_worker) as p:
+                chunksize = max(1, len(ufos) // (multiprocessing.cpu_count() * 4))
+                list(p.imap_unordered(_build, ufos, chunksize=chunksize))
         else:
             _build_otf(ufos, output_dir)
     with Timer('Adding MATH table...'):
-        font.add_math_table(toml_path, input_dir=output_dir)
+        font.add_math_table(toml_path, input_dir=output_dir, parallel=parallel)
+
+
+@functools.lru_cache(maxsize=None)
+def _layers_by_id(glyph: GSGlyph) -> dict[str, GSLayer]:
+    '''Map `layerId` to layer for `glyph`, cached since glyphs referenced by many
+    composites would otherwise be scanned once per component.
+    '''
+    return {layer.layerId: layer for layer in glyph.layers}
+
+
+def _instantiate_math_table(args) -> tuple[str, MathTable]:
+    style, master_data, interpolation, removed_glyphs = args
+    return style, MathTableInstantiator(master_data, interpolation, removed_glyphs).generate()
+
+
+def _write_font(args):
+    '''Inject the MATH table into a single OTF and normalize its glyph names.
+    Top-level so it can run in the worker pool; the `otTables` objects are constructed
+    here via `encode()` since they do not pickle cleanly.
+    '''
+    input_path, output_path, math_table, production_names = args
+    # Lazy loading: only the tables each pass touches are decompiled, the rest are
+    # passed through to `save` as raw bytes. The MATH table must be compiled before
+    # the glyph names change, and a lazy TTFont cannot overwrite its own source
+    # file, so the intermediate result lives in a buffer.
+    buffer = io.BytesIO()
+    with TTFont(input_path, lazy=True) as tt_font:
+        tt_font['MATH'] = newTable('MATH')
+        tt_font['MATH'].table = math_table.encode()
+        tt_font.save(buffer)
+    buffer.seek(0)
+    with TTFont(buffer, lazy=True) as tt_font:
+        _normalize_glyph_names(tt_font, production_names)
+        output = io.BytesIO()
+        tt_font.save(output)
+    with open(output_path, 'wb') as output_file:
+        output_file.write(output.getbuffer())
+
+
+def _normalize_glyph_names(tt_font: TTFont, production_names: dict[str, str]):
+    '''Normalize glyph names using AGL convention.'''
+    cff = tt_font['CFF '].cff
+    cff.strings.strings = [
+        _normalize_string(s, production_names) for s in cff.strings.strings
+    ]
+
+
+def _normalize_string(s: str, production_names: dict[str, str]) -> str:
+    # Ad-hoc treatment for copyright string
+    if 'Copyright Copyright' in s:
+        s = s.replace('Copyright Copyright', 'Copyright')  # For U+00A9 `©`
+        s = s.replace('?', '-')  # For U+2013 `–`
+        return s
+    # For glyph names
+    return production_names.get(s, s)
+
+
+def _init_otf_worker():
+    '''Import fontmake once per worker, before the first task arrives.'''
+    import fontmake.font_project  # pylint: disable=import-outside-toplevel,unused-import
 
 
 def _build_otf(ufo, output_dir):
@@ -1,6 +1,10 @@
 '''OpenType MATH table.
 '''
 
+import operator
+
+import numpy as np
+
 from fontTools.ttLib.tables import otTables
 
 
@@ -55,10 +59,12 @@ class MathTable:
         return glyph_info
 
     def _glyph_info(self, name: str):
+        values = self.glyph_info[name]
+        keys = list(values)
         return (
-            list(map(self._math_value, self.glyph_info[name].values())),
-            self._coverage(self.glyph_info[name].keys()),
-            len(self.glyph_info[name])
+            [self._math_value(values[key]) for key in keys],
+            self._coverage(keys),
+            len(keys)
         )
 
     def _encode_variants(self):
@@ -78,7 +84,10 @@ class MathTable:
             if glyph not in constructions:
                 constructions[glyph] = self._glyph_construction({})
             constructions[glyph].GlyphAssembly = self._glyph_assembly(component)
-        return constructions.values(), self._coverage(constructions.keys()), len(constructions)
+        # Materialize the views once: fontTools may iterate them more than once,
+        # and the coverage must keep the insertion order of the dict.
+        keys = list(constructions.keys())
+        return list(constructions.values()), self._coverage(keys), len(keys)
 
     @staticmethod
     def _glyph_construction(variants: dict):
@@ -109,11 +118,17 @@ class MathTable:
             t.PartRecords.append(r)
         return t
 
+    # Values repeat a lot (0 and a few common offsets), and the records carry no
+    # per-glyph state (`DeviceTable` is always `None`), so they can be shared.
+    _math_value_cache: dict[int, otTables.MathValueRecord] = {}
+
     @staticmethod
     def _math_value(value):
-        t = otTables.MathValueRecord()
-        t.DeviceTable = None
-        t.Value = value
+        if (t := MathTable._math_value_cache.get(value)) is None:
+            t = otTables.MathValueRecord()
+            t.DeviceTable = None
+            t.Value = value
+            MathTable._math_value_cache[value] = t
         return t
 
     @staticmethod
@@ -135,7 +150,9 @@ class MathTableInstantiator:
         self.master_glyph_info: dict[str]       = data['MathGlyphInfo']
         self.master_variants:   dict[str]       = data['MathVariants']
         self.interpolation  = interpolation
-        self.removed_glyphs = set(removed_glyphs) if removed_glyphs else set()
+        self.removed_glyphs = frozenset(removed_glyphs or ())
+        self._weights: np.ndarray = None
+        self._interpolate = _make_interpolator(interpolation)
 
     def generate(self) -> MathTable:
         math_table = MathTable()
@@ -145,14 +162,25 @@ class MathTableInstantiator:
         return math_table
 
     def _generate_constants(self) -> dict[str, dict[str]]:
-        return {
-            name: self._generate(value)
-            for name, value in self.master_constants.items()
-        }
+        return self._generate_all(self.master_constants)
 
     def _generate(self, values: list[int]) -> int:
         '''Generate a specific value for the instance.'''
-        return round(sum(values[i] * v for i, v in self.interpolation))
+        return self._interpolate(values)
+
+    def _generate_all(self, mapping: dict) -> dict:
+        '''Generate all values of `mapping` for the instance with a single matrix product,
+        which is much faster than calling `_generate` in a Python-level loop.
+        '''
+        if not mapping:
+            return {}
+        if self._weights is None:
+            self._weights = np.zeros(len(next(iter(mapping.values()))))
+            for i, v in self.interpolation:
+                self._weights[i] = v
+        matrix = np.array(list(mapping.values()), dtype=np.float64)
+        values = np.rint(matrix @ self._weights).astype(int).tolist()
+        return dict(zip(mapping.keys(), values))
 
     def _generate_glyph_info(self) -> dict[str]:
         return {
@@ -163,10 +191,10 @@ class MathTableInstantiator:
 
     def _glyph_info(self, name: str) -> dict[str]:
         # TODO: consider brace layers
-        return {
-            g: self._generate(values)
+        return self._generate_all({
+            g: values
             for g, values in self.master_glyph_info[name].items() if g not in self.removed_glyphs
-        }
+        })
 
     def _generate_variants(self) -> dict[str]:
         return {
@@ -179,10 +207,16 @@ class MathTableInstantiator:
 
     def _variants(self, name: str) -> dict[str]:
         '''`name` can be either `"Horizontal"` or `"Vertical"`.'''
-        return {
-            glyph: {g: self._generate(values) for g, values in variants.items()}
-            for glyph, variants in self.master_variants[name + 'Variants'].items()
-        }
+        master_variants = self.master_variants[name + 'Variants']
+        advances = self._generate_all({
+            (glyph, g): values
+            for glyph, variants in master_variants.items()
+            for g, values in variants.items()
+        })
+        result = {glyph: {} for glyph in master_variants}
+        for (glyph, g), advance in advances.items():
+            result[glyph][g] = advance
+        return result
 
     def _components(self, name: str) -> dict[str]:
         '''`name` can be either `"Horizontal"` or `"Vertical"`.'''
@@ -203,3 +237,15 @@ class MathTableInstantiator:
             'endConnector':   self._generate(part['endConnector']),
             'fullAdvance':    self._generate(part['fullAdvance']),
         }
+
+
+def _make_interpolator(interpolation: list[tuple[int, float]]):
+    '''Return `values -> round(sum(values[i] * v))` with the interpolation pairs
+    hoisted into locals, which are much cheaper than per-call attribute lookups.
+    '''
+    if len(interpolation) == 1:
+        (index, weight), = interpolation
+        return lambda values: round(values[index] * weight)
+    pick = operator.itemgetter(*(i for i, _ in interpolation))
+    weights = tuple(v for _, v in interpolation)
+    return lambda values: round(sum(map(operator.mul, pick(values), weights)))